@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from fpdf import FPDF
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+from visualizer import Visualizer
+
+NUM_CHARTS = 12
+NUM_DUPLICATES = 4
+BASELINE_CHARTS = 2
+
+# Objectifs relatifs à l'export d'origine (PNG RGBA à 300 dpi, sans déduplication), extrapolé à NUM_CHARTS graphiques
+MAX_TIME_RATIO = 0.25
+MAX_SIZE_RATIO = 1.0
+
+def draw_chart(index):
+    """Dessine un graphique représentatif du rapport (barres + histogramme)."""
+    rng = np.random.default_rng(index)
+    fig, (ax_bar, ax_hist) = plt.subplots(1, 2, figsize=(12, 6))
+    pd.Series(rng.uniform(1.6, 2.1, 13), index=[f"Région {i}" for i in range(13)]).plot(
+        kind="bar", ax=ax_bar, color="skyblue", edgecolor="black"
+    )
+    ax_hist.hist(rng.normal(1.8, 0.1, 10000), bins=30, color="purple", edgecolor="black")
+    fig.tight_layout()
+    return fig
+
+def draw_heatmap(index):
+    """Dessine un graphique raster (carte de chaleur), le cas visé par l'encodage JPEG."""
+    rng = np.random.default_rng(index)
+    field = np.cumsum(np.cumsum(rng.normal(size=(120, 240)), axis=0), axis=1)
+    fig, ax = plt.subplots(figsize=(12, 6))
+    image = ax.imshow(field, cmap="viridis", interpolation="bilinear", aspect="auto")
+    fig.colorbar(image, ax=ax)
+    fig.tight_layout()
+    return fig
+
+# Suite : (fonction de dessin, formats évalués). Le JPEG n'est évalué que sur les graphiques raster.
+SUITES = {
+    "graphiques": (draw_chart, ["png"]),
+    "raster": (draw_heatmap, ["png", "jpeg"]),
+}
+
+def new_baseline_pdf():
+    """Crée un PDF configuré comme le Visualizer d'origine."""
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.add_font('NotoSans', '', os.path.join(ROOT, 'fonts/NotoSans-Medium.ttf'), uni=True)
+    pdf.add_font('NotoSans', 'B', os.path.join(ROOT, 'fonts/NotoSans-Bold.ttf'), uni=True)
+    pdf.set_font("NotoSans", size=12)
+    return pdf
+
+def run_baseline(draw, num_charts):
+    """Export d'origine : retourne (temps, taille) pour num_charts graphiques distincts."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, "rapport.pdf")
+        start = time.perf_counter()
+        pdf = new_baseline_pdf()
+        for i in range(num_charts):
+            fig = draw(i)
+            image_path = os.path.join(tmp_dir, f"{i}.png")
+            fig.savefig(image_path, format="PNG", bbox_inches='tight', dpi=300)
+            plt.close(fig)
+            if pdf.get_y() + 120 > 270:
+                pdf.add_page()
+            pdf.image(image_path, x=10, y=pdf.get_y(), w=150, h=90)
+            pdf.ln(100)
+        pdf.output(output)
+        return time.perf_counter() - start, os.path.getsize(output)
+
+def estimate_baseline(draw):
+    """Extrapole l'export d'origine à NUM_CHARTS graphiques sans duplication (il ne dédupliquait pas)."""
+    empty_time, empty_size = run_baseline(draw, 0)
+    elapsed, size = run_baseline(draw, BASELINE_CHARTS)
+    per_chart_time = (elapsed - empty_time) / BASELINE_CHARTS
+    per_chart_size = (size - empty_size) / BASELINE_CHARTS
+    return empty_time + NUM_CHARTS * per_chart_time, empty_size + NUM_CHARTS * per_chart_size
+
+def run(draw, image_format):
+    """Génère un rapport avec le Visualizer et retourne (temps d'export, taille du PDF)."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, "rapport.pdf")
+        start = time.perf_counter()
+        visualizer = Visualizer(pd.DataFrame(), image_format=image_format)
+        visualizer.add_main_title("Benchmark")
+        for i in range(NUM_CHARTS):
+            fig = draw(i % (NUM_CHARTS - NUM_DUPLICATES))
+            visualizer.save_plot_to_pdf(fig, f"Graphique {i}")
+            plt.close(fig)
+        visualizer.export(output)
+        elapsed = time.perf_counter() - start
+        return elapsed, os.path.getsize(output)
+
+if __name__ == '__main__':
+    os.chdir(ROOT)
+    failed = False
+    for suite, (draw, image_formats) in SUITES.items():
+        baseline_time, baseline_size = estimate_baseline(draw)
+        max_time, max_size = baseline_time * MAX_TIME_RATIO, baseline_size * MAX_SIZE_RATIO
+        print(f"{suite} - référence : {baseline_time:6.2f} s, {baseline_size / 1024:8.1f} Ko")
+
+        sizes = {}
+        for image_format in image_formats:
+            elapsed, size = run(draw, image_format)
+            sizes[image_format] = size
+            ok = elapsed <= max_time and size <= max_size
+            failed = failed or not ok
+            print(f"{suite} - {image_format:>5} : {elapsed:6.2f} s (max {max_time:.1f} s), "
+                  f"{size / 1024:8.1f} Ko (max {max_size / 1024:.0f} Ko) {'OK' if ok else 'ÉCHEC'}")
+
+        if "jpeg" in sizes:
+            ok = sizes["jpeg"] <= sizes["png"]
+            failed = failed or not ok
+            print(f"{suite} - jpeg plus petit que png : {'OK' if ok else 'ÉCHEC'}")
+    sys.exit(1 if failed else 0)
@@ -1,12 +1,15 @@
 import requests
 import os
 import json
+import time
 from tqdm import tqdm
+from cache import ArtifactCache
 
 class APIClient:
-    def __init__(self):
+    def __init__(self, cache: ArtifactCache=None):
         self.__base_url = 'https://data.opendatasoft.com/api/explore/v2.1'
         self.data = None
+        self.cache = cache
 
     def list_datasets(self):
         """Liste les datasets disponibles."""
@@ -19,19 +22,36 @@ class APIClient:
         except requests.RequestException as e:
             raise Exception(f"Erreur de connexion: {e}")
 
-    def get_dataset(self, dataset_name: str, file_path: str="__DEFAULT__"):
-        """Télécharge un dataset et affiche une barre de progression."""
+    def get_dataset(self, dataset_name: str, file_path: str="__DEFAULT__", max_age: int=3600, refresh: bool=False):
+        """Télécharge un dataset et affiche une barre de progression.
+
+        Si le cache est actif, l'instantané est réutilisé tant qu'il a moins de max_age secondes, sauf si refresh=True.
+        Le fichier file_path est écrit dans les deux cas.
+        """
+        url = f'{self.__base_url}/catalog/datasets/{dataset_name}/exports/json'
+        if file_path == "__DEFAULT__":
+            file_path = '../data/row_' + dataset_name + '.json'
+
+        if self.cache is not None:
+            key = ArtifactCache.make_key("snapshot", url)
+            snapshot = self.cache.get(key)
+            if not refresh and snapshot is not None and time.time() - snapshot["fetched_at"] < max_age:
+                print("Dataset récupéré depuis le cache.")
+                self.data = snapshot["data"]
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, "w", encoding="utf-8") as file:
+                    json.dump(self.data, file, indent=4, ensure_ascii=False)
+                print(f"Dataset sauvegardé dans : {file_path}")
+                return True
+
         print("Téléchargement du dataset...")
         try:
-            url = f'{self.__base_url}/catalog/datasets/{dataset_name}/exports/json'
+            fetched_at = time.time()
             with requests.get(url, stream=True) as response:
                 response.raise_for_status()
                 total_size = int(response.headers.get('content-length', 0))
                 block_size = 1024
                 
-                if file_path == "__DEFAULT__":
-                    file_path = '../data/row_' + dataset_name + '.json'
-                
                 os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
                 with open(file_path, "wb") as file, tqdm(total=total_size, unit='iB', unit_scale=True, desc="Téléchargement") as bar:
@@ -47,6 +67,8 @@ class APIClient:
 
                 print(f"Dataset téléchargé et sauvegardé dans : {file_path}")
                 self.data = data
+                if self.cache is not None:
+                    self.cache.put(key, {"fetched_at": fetched_at, "data": data})
                 return True
         except requests.RequestException as e:
             raise Exception(f"Erreur de connexion: {e}")
@@ -0,0 +1,127 @@
+import os
+import json
+import pickle
+import hashlib
+import inspect
+import tempfile
+import functools
+import pandas as pd
+
+class ArtifactCache:
+    def __init__(self, directory: str="cache", max_size: int=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """Calcule une clé SHA-256 à partir des entrées, des paramètres et de la version du code."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                digest.update(part)
+            else:
+                digest.update(json.dumps(part, sort_keys=True, default=repr, ensure_ascii=False).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def code_version(*funcs):
+        """Retourne une empreinte du code source des fonctions données."""
+        digest = hashlib.sha256()
+        for func in funcs:
+            digest.update(inspect.getsource(func).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def module_version(func):
+        """Retourne une empreinte du code source du module qui définit la fonction (méthodes et fonctions auxiliaires comprises)."""
+        return hashlib.sha256(inspect.getsource(inspect.getmodule(func)).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def frame_key(df: pd.DataFrame):
+        """Calcule une empreinte du contenu d'un DataFrame : valeurs, index, colonnes, types et attrs."""
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(df.index).to_numpy().tobytes())
+        for col in df.columns:
+            try:
+                hashes = pd.util.hash_pandas_object(df[col], index=False)
+            except (TypeError, ValueError):
+                # Colonnes contenant des listes ou des dictionnaires, non hachables directement
+                hashes = pd.util.hash_pandas_object(df[col].map(repr), index=False)
+            digest.update(hashes.to_numpy().tobytes())
+        return ArtifactCache.make_key(digest.hexdigest(), list(map(str, df.columns)), list(map(str, df.dtypes)), df.attrs)
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def get(self, key: str, default=None):
+        """Récupère un artefact du cache et le marque comme récemment utilisé."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except Exception as e:
+            # Artefact illisible (fichier tronqué, autre version de pandas/numpy, classe déplacée...) : traité comme absent
+            print(f"Artefact de cache illisible, supprimé : {path} ({e})")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return default
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value):
+        """Enregistre un artefact dans le cache puis applique l'éviction LRU."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise Exception(f"Erreur lors de l'écriture dans le cache : {e}")
+        self._evict()
+        return value
+
+    def _evict(self):
+        """Supprime les artefacts les moins récemment utilisés tant que la taille maximale est dépassée."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total_size -= size
+
+def cached_stage(method):
+    """Met en cache l'état produit par une étape de traitement (attributs CACHED_STATE), chaîné sur la clé de l'étape précédente."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return method(self, *args, **kwargs)
+
+        key = ArtifactCache.make_key(self.key, method.__name__, args, kwargs, ArtifactCache.module_version(method))
+        state = self.cache.get(key)
+        if isinstance(state, dict):
+            print(f"Étape '{method.__name__}' récupérée depuis le cache.")
+            for name, value in state.items():
+                setattr(self, name, value)
+            self.key = key
+            return self
+
+        result = method(self, *args, **kwargs)
+        self.cache.put(key, {name: getattr(self, name) for name in self.CACHED_STATE})
+        self.key = key
+        return result
+    return wrapper
@@ -2,13 +2,32 @@ import os
 import json
 import pandas as pd
 import numpy as np
+from itertools import compress
 from tqdm import tqdm
 from sklearn.preprocessing import StandardScaler, RobustScaler
+from cache import ArtifactCache, cached_stage
 
 class DataProcessor():
-    def __init__(self):
+    REQUIRED_COLUMNS = [
+        "id", "latitude", "longitude", "adresse", "ville", "pop", "prix", "services", "horaires",
+        "code_departement", "region", "code_region"
+    ]
+    PRICE_RANGES = {
+        "Gazole": (0.5, 3.5), "SP95": (0.5, 3.5), "SP98": (0.5, 3.5),
+        "E10": (0.5, 3.5), "E85": (0.3, 2.5), "GPLc": (0.3, 2.5)
+    }
+    LATITUDE_RANGE = (41.0, 51.5)
+    LONGITUDE_RANGE = (-5.5, 10.0)
+    CACHED_STATE = ("df", "services_vocab")
+
+    def __init__(self, cache: ArtifactCache=None):
         self.data = None
         self.df = None
+        self.services_vocab = None
+        self.cache = cache
+        self.key = None
+        self.quarantine = None
+        self.validation_counts = {}
         self._configure_progress_bar()
 
     def _configure_progress_bar(self):
@@ -19,6 +38,8 @@ class DataProcessor():
         """Charge les données depuis un dictionnaire."""
         try:
             self.data = data
+            if self.cache is not None:
+                self.key = ArtifactCache.make_key(data)
             print("Dataset chargé depuis le dictionnaire fourni.")
         except Exception as e:
             raise Exception(f"Erreur lors du chargement du dataset depuis le dictionnaire : {e}")
@@ -27,13 +48,133 @@ class DataProcessor():
     def load_from_file(self, file_path: str):
         """Charge un fichier JSON."""
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                self.data = json.load(file)
+            with open(file_path, "rb") as file:
+                raw = file.read()
+            self.data = json.loads(raw.decode("utf-8"))
+            if self.cache is not None:
+                self.key = ArtifactCache.make_key(raw)
             print(f"Dataset chargé depuis : {file_path}")
         except Exception as e:
             raise Exception(f"Erreur lors du chargement du dataset : {e}")
         return self
 
+    def validate(self, max_invalid_ratio: float=0.2):
+        """Validation du lot brut : colonnes requises, prix par carburant, coordonnées, identifiants et dates.
+
+        Les lignes invalides sont mises en quarantaine avec leurs raisons. Le lot est rejeté si une colonne
+        requise manque, si un carburant déclaré dans PRICE_RANGES n'apparaît dans aucun prix valide,
+        ou si la part de lignes invalides dépasse max_invalid_ratio.
+        """
+        if not self.data:
+            raise Exception("Il n'y a pas de données chargées.")
+
+        print("Validation des données...")
+        raw = pd.DataFrame(self.data)
+
+        missing_cols = [col for col in self.REQUIRED_COLUMNS if col not in raw.columns]
+        if missing_cols:
+            raise Exception(f"Lot rejeté, colonnes requises absentes : {', '.join(missing_cols)}")
+
+        checks = {}
+
+        checks["id_duplique"] = raw["id"].duplicated(keep="first")
+
+        latitude = pd.to_numeric(raw["latitude"], errors="coerce") / 100000
+        longitude = pd.to_numeric(raw["longitude"], errors="coerce") / 100000
+        checks["coordonnees_hors_france"] = ~(
+            latitude.between(*self.LATITUDE_RANGE) & longitude.between(*self.LONGITUDE_RANGE)
+        )
+
+        parsed = raw["prix"].map(self._parse_prix)
+        checks["prix_malforme"] = parsed.isna()
+
+        items = parsed.dropna().explode().dropna()
+        noms = items.map(lambda item: item.get("@nom") if isinstance(item, dict) else None)
+        valeurs = items.map(lambda item: item.get("@valeur") if isinstance(item, dict) else None)
+        numeric = pd.to_numeric(valeurs, errors="coerce")
+
+        def per_station(mask):
+            return mask.groupby(level=0).any().reindex(raw.index, fill_value=False)
+
+        # Un prix à 0 ou vide signifie « carburant non vendu » : traité comme manquant, comme dans prepare_data
+        placeholder = valeurs.eq("") | numeric.eq(0)
+
+        checks["prix_champ_manquant"] = per_station(noms.isna() | valeurs.isna())
+        checks["prix_valeur_non_numerique"] = per_station(valeurs.notna() & ~placeholder & numeric.isna())
+
+        missing_fuel_cols = []
+        for fuel, (low, high) in self.PRICE_RANGES.items():
+            out_of_range = per_station(noms.eq(fuel) & ~placeholder & numeric.notna() & ~numeric.between(low, high))
+
+            price_col, date_col = f"{fuel.lower()}_prix", f"{fuel.lower()}_maj"
+            if price_col in raw.columns:
+                values = raw[price_col].replace("", np.nan)
+                price = pd.to_numeric(values, errors="coerce")
+                out_of_range |= values.notna() & price.ne(0) & ~price.between(low, high)
+            else:
+                missing_fuel_cols.append(price_col)
+            checks[f"prix_{fuel.lower()}_hors_limites"] = out_of_range
+
+            if date_col in raw.columns:
+                values = raw[date_col].replace("", np.nan)
+                dates = pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+                checks[f"date_{fuel.lower()}_invalide"] = values.notna() & dates.isna()
+            else:
+                missing_fuel_cols.append(date_col)
+
+        if missing_fuel_cols:
+            print(f"Colonnes de carburant absentes, contrôles ignorés : {', '.join(missing_fuel_cols)}")
+
+        reasons = pd.Series("", index=raw.index)
+        for name, mask in checks.items():
+            reasons[mask] += name + ";"
+        invalid = reasons.ne("")
+
+        valid_noms = set(noms[~invalid.reindex(noms.index).to_numpy()].dropna())
+        missing_fuels = [fuel for fuel in self.PRICE_RANGES if fuel not in valid_noms]
+
+        self.validation_counts = {name: int(mask.sum()) for name, mask in checks.items()}
+        self.validation_counts["colonnes_carburant_absentes"] = len(missing_fuel_cols)
+        self.validation_counts["carburants_absents"] = len(missing_fuels)
+        self.validation_counts["lignes_valides"] = int((~invalid).sum())
+        self.validation_counts["lignes_en_quarantaine"] = int(invalid.sum())
+        self.quarantine = raw[invalid].assign(raisons=reasons[invalid].str.rstrip(";"))
+
+        for name, count in self.validation_counts.items():
+            print(f"  {name} : {count}")
+
+        if missing_fuels:
+            raise Exception(f"Lot rejeté, carburants absents des prix valides : {', '.join(missing_fuels)}")
+        if invalid.mean() > max_invalid_ratio:
+            raise Exception(
+                f"Lot rejeté : {invalid.sum()} lignes invalides sur {len(raw)} (maximum autorisé : {max_invalid_ratio:.0%})."
+            )
+
+        self.data = list(compress(self.data, (~invalid).tolist()))
+        if self.cache is not None:
+            self.key = ArtifactCache.make_key(
+                self.key, "validate", max_invalid_ratio, ArtifactCache.module_version(DataProcessor.validate)
+            )
+
+        print("Validation terminée.")
+        return self
+
+    @staticmethod
+    def _parse_prix(prix):
+        """Décode une entrée 'prix' en liste ; retourne None si elle est malformée."""
+        if isinstance(prix, list):
+            return prix
+        if prix is None or prix == "" or (isinstance(prix, float) and np.isnan(prix)):
+            return []
+        if not isinstance(prix, str):
+            return None
+        try:
+            prix_list = json.loads(prix)
+        except json.JSONDecodeError:
+            return None
+        return prix_list if isinstance(prix_list, list) else None
+
+    @cached_stage
     def clean_missing_and_outliers(self):
         """Nettoyage des données : suppression des valeurs manquantes et identification des valeurs aberrantes."""
         if self.data is None:
@@ -59,6 +200,7 @@ class DataProcessor():
         print("Nettoyage terminé.")
         return self
 
+    @cached_stage
     def prepare_data(self):
         """Préparation des données : normalisation et transformation des colonnes."""
         if self.df is None:
@@ -70,24 +212,30 @@ class DataProcessor():
         scaler = StandardScaler()
         self.df[numeric_cols] = scaler.fit_transform(self.df[numeric_cols])
         
-        self.df["services"] = self.df["services"].progress_apply(
-            lambda x: ", ".join(json.loads(x)["service"]) if x else np.nan
+        services_lists = self.df["services"].progress_apply(
+            lambda x: json.loads(x)["service"] if isinstance(x, str) else []
         )
+        self.df["services"] = services_lists.apply(lambda x: ", ".join(x) if x else np.nan)
         
         def extract_prices(prix):
             try:
                 prix_list = json.loads(prix) if isinstance(prix, str) else prix
                 if isinstance(prix_list, list):
-                    return {item["@nom"]: float(item["@valeur"]) for item in prix_list}
+                    return {
+                        item["@nom"]: float(item["@valeur"]) if item["@valeur"] != "" else np.nan
+                        for item in prix_list
+                    }
             except (json.JSONDecodeError, TypeError, KeyError):
                 pass
             return {}
         
         self.df["prix"] = self.df["prix"].progress_apply(extract_prices)
         
-        prix_df = self.df["prix"].apply(pd.Series)
+        prix_df = self.df["prix"].apply(pd.Series).replace(0, np.nan)
         self.df = pd.concat([self.df, prix_df], axis=1)
         self.df.drop(columns=["prix"], inplace=True)
+
+        self._encode_services(services_lists)
         
         self.df["horaires"] = self.df["horaires"].progress_apply(
             lambda x: "; ".join(
@@ -102,6 +250,46 @@ class DataProcessor():
         print("Préparation des données terminée.")
         return self
 
+    def _encode_services(self, services_lists: pd.Series):
+        """Encode les services de chaque station dans un masque de bits (un bit par service du vocabulaire)."""
+        exploded = services_lists.explode().dropna()
+        vocab = sorted(exploded.unique())
+        if len(vocab) > 64:
+            raise Exception(f"Trop de services distincts pour un masque 64 bits : {len(vocab)}.")
+
+        pairs = exploded.reset_index().drop_duplicates()
+        codes = pd.Categorical(pairs.iloc[:, 1], categories=vocab).codes.astype(np.uint64)
+        bits = pd.Series(np.left_shift(np.uint64(1), codes), index=pairs.iloc[:, 0])
+
+        self.df["services_mask"] = (
+            bits.groupby(level=0).sum()
+            .reindex(self.df.index, fill_value=0)
+            .astype(np.uint64)
+        )
+        self.services_vocab = vocab
+        return self
+
+    def services_mask(self, *services: str):
+        """Retourne le masque de bits correspondant à une liste de services."""
+        vocab = self.services_vocab
+        if vocab is None:
+            raise Exception("Les services doivent être encodés avant d'être filtrés.")
+        unknown = [s for s in services if s not in vocab]
+        if unknown:
+            raise Exception(f"Services inconnus : {', '.join(unknown)}")
+        mask = np.uint64(0)
+        for service in services:
+            mask |= np.uint64(1) << np.uint64(vocab.index(service))
+        return mask
+
+    def filter_by_services(self, *services: str, match_all: bool = True):
+        """Retourne les stations proposant tous les services demandés (ou au moins un si match_all=False)."""
+        mask = self.services_mask(*services)
+        station_masks = self.df["services_mask"].to_numpy(dtype=np.uint64)
+        if match_all:
+            return self.df[(station_masks & mask) == mask]
+        return self.df[(station_masks & mask) != 0]
+
     def summarize_data(self):
         """Résumé des données : génère des statistiques descriptives sur les colonnes clés."""
         if self.df is None:
@@ -127,6 +315,7 @@ class DataProcessor():
 if __name__ == '__main__':
     processor = DataProcessor()
     processor.load_from_file("/data/row_dataset.json") \
+        .validate() \
         .clean_missing_and_outliers() \
         .prepare_data() \
         .summarize_data() \
@@ -1,19 +1,23 @@
 from api_client import APIClient
 from data_processor import DataProcessor
 from visualizer import Visualizer
+from cache import ArtifactCache
 
 if __name__ == '__main__':
-    api = APIClient()
+    cache = ArtifactCache()
+
+    api = APIClient(cache)
     api.get_dataset("prix-des-carburants-en-france-flux-instantane-v2@opendatamef")
     
-    processor = DataProcessor()
+    processor = DataProcessor(cache)
     processor.load(api.data) \
+        .validate() \
         .clean_missing_and_outliers() \
         .prepare_data() \
         .summarize_data() \
         .save()
         
-    visualizer = Visualizer(processor.df)
+    visualizer = Visualizer(processor.df, cache, processor.services_vocab)
     visualizer.add_main_title("TP3 - Prix des carburants (Johan Ledoux)")
     visualizer.add_paragraph("Le jeu de données est intéressant car il touche un sujet qui concerne de nombreuses personnes : le coût du carburant. Il permet d’identifier les stations proposant les carburants les moins chers, de comprendre les différences de prix selon les régions, et d’analyser les services associés, comme la disponibilité de bornes de recharge ou de boutiques. Ce jeu de données peut aussi révéler les disparités géographiques, notamment dans les zones rurales où l’accès aux carburants peut être plus limité, et ainsi aider à mieux comprendre les difficultés d'accès ou les zones où l’offre est moins compétitive.")
     visualizer.graph_available_fuel_distribution() \
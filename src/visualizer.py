@@ -1,14 +1,63 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.pyplot as plt
 from fpdf import FPDF
 import tempfile
+import functools
+import hashlib
+import io
 import os
 from datetime import datetime
+from PIL import Image
+from cache import ArtifactCache
+
+def cached_graph(method):
+    """Met en cache les images produites par un graphique, selon le contenu du DataFrame, les paramètres et le code."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return method(self, *args, **kwargs)
+
+        key = ArtifactCache.make_key(
+            ArtifactCache.frame_key(self.df), method.__name__, args, kwargs, self.services_vocab,
+            self.image_format, self.image_quality, self.dpi,
+            ArtifactCache.code_version(
+                method, Visualizer.render_plot, Visualizer.save_plot_to_pdf,
+                Visualizer.insert_image, Visualizer._rupture_dates
+            )
+        )
+        images = self.cache.get(key)
+        if images is not None:
+            print(f"Graphique '{method.__name__}' récupéré depuis le cache.")
+            for title, image in images:
+                self.insert_image(image, title)
+            return self
+
+        self._rendered = []
+        try:
+            result = method(self, *args, **kwargs)
+            self.cache.put(key, self._rendered)
+        finally:
+            self._rendered = None
+        return result
+    return wrapper
 
 class Visualizer:
-    def __init__(self, df):
+    IMAGE_FORMATS = ("png", "jpeg")
+
+    def __init__(self, df, cache: ArtifactCache=None, services_vocab: list=None,
+                 image_format: str="png", image_quality: int=85, dpi: int=300):
+        if image_format not in self.IMAGE_FORMATS:
+            raise Exception(f"Format d'image non supporté : {image_format} (formats possibles : {', '.join(self.IMAGE_FORMATS)}).")
         self.df = df
+        self.cache = cache
+        self.services_vocab = services_vocab
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.dpi = dpi
+        self._rendered = None
+        self._image_dir = None
         self.pdf = FPDF()
         self.pdf.set_auto_page_break(auto=True, margin=15)
         self.pdf.add_page()
@@ -38,26 +87,68 @@ class Visualizer:
         self.pdf.cell(0, 10, title, ln=True, align="C")
         self.pdf.ln(5)
 
+    def _rupture_dates(self, col):
+        """Convertit une colonne de début de rupture en dates sans fuseau horaire."""
+        return pd.to_datetime(self.df[col], errors="coerce").dt.tz_localize(None)
+
+    def render_plot(self, plt_figure):
+        """Rend une figure matplotlib en image PNG compressée ou JPEG, sans canal alpha (coûteux à intégrer pour FPDF)."""
+        buffer = io.BytesIO()
+        plt_figure.savefig(
+            buffer, format="PNG", bbox_inches='tight', dpi=self.dpi, facecolor="white",
+            pil_kwargs={"compress_level": 1}
+        )
+        buffer.seek(0)
+        with Image.open(buffer) as img:
+            rgb = img.convert("RGB")
+
+        output = io.BytesIO()
+        if self.image_format == "jpeg":
+            rgb.save(output, format="JPEG", quality=self.image_quality, optimize=True)
+        else:
+            # optimize=True ne gagne que ~10 % de taille pour un temps d'encodage jusqu'à 10 fois plus long
+            rgb.save(output, format="PNG", compress_level=6)
+        return output.getvalue()
+
     def save_plot_to_pdf(self, plt_figure, title):
-        """Ajoute une figure matplotlib dans le PDF avec gestion des proportions, du centrage et des sauts de page."""
+        """Rend une figure matplotlib et l'ajoute dans le PDF."""
+        image = self.render_plot(plt_figure)
+        if self._rendered is not None:
+            self._rendered.append((title, image))
+        self.insert_image(image, title)
+
+    def insert_image(self, image, title):
+        """Ajoute une image dans le PDF avec gestion des proportions, du centrage et des sauts de page.
+
+        Le fichier est nommé d'après l'empreinte de son contenu : FPDF n'intègre qu'une fois les images identiques.
+        FPDF lit l'image dès l'appel à image(), le fichier temporaire est donc supprimé aussitôt après.
+        """
         if self.pdf.get_y() + 120 > 270:
             self.pdf.add_page()
         self.add_title(title)
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
-            plt_figure.savefig(tmp_file.name, format="PNG", bbox_inches='tight', dpi=300)
-            from PIL import Image
-            img = Image.open(tmp_file.name)
+
+        with Image.open(io.BytesIO(image)) as img:
             img_width, img_height = img.size
-            img.close()
-            pdf_height = 90
-            aspect_ratio = img_width / img_height
-            pdf_width = pdf_height * aspect_ratio
-            x_position = (self.pdf.w - pdf_width) / 2
-            self.pdf.image(tmp_file.name, x=x_position, y=self.pdf.get_y(), w=pdf_width, h=pdf_height)
-            tmp_file.close()
-        os.remove(tmp_file.name)
+            extension = img.format.lower()
+        if self._image_dir is None:
+            self._image_dir = tempfile.TemporaryDirectory()
+        image_path = os.path.join(self._image_dir.name, f"{hashlib.sha256(image).hexdigest()}.{extension}")
+
+        pdf_height = 90
+        aspect_ratio = img_width / img_height
+        pdf_width = pdf_height * aspect_ratio
+        x_position = (self.pdf.w - pdf_width) / 2
+        try:
+            if image_path not in self.pdf.images:
+                with open(image_path, "wb") as file:
+                    file.write(image)
+            self.pdf.image(image_path, x=x_position, y=self.pdf.get_y(), w=pdf_width, h=pdf_height)
+        finally:
+            if os.path.exists(image_path):
+                os.remove(image_path)
         self.pdf.ln(100)
 
+    @cached_graph
     def graph_available_fuel_distribution(self):
         """Répartition des types de carburants disponibles."""
         print("Création du graphique : Répartition des types de carburants disponibles...")
@@ -83,6 +174,7 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_fuel_prices_by_region(self):
         """Graphique des prix des carburants pour chaque région."""
         print("Création du graphique : Prix des carburants par région...")
@@ -93,8 +185,6 @@ class Visualizer:
         if not all(col in self.df.columns for col in fuel_cols):
             raise Exception("Les colonnes de carburants sont absentes du DataFrame.")
 
-        self.df[fuel_cols] = self.df[fuel_cols].replace(0, pd.NA).dropna(how='all', subset=fuel_cols)
-
         median_prices = self.df.groupby("region")[fuel_cols].median()
 
         median_prices = median_prices.sort_index()
@@ -116,6 +206,7 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_fuel_popularity(self):
         """Graphique : Nombre de stations offrant chaque carburant."""
         print("Création du graphique : Nombre de stations offrant chaque carburant...")
@@ -131,6 +222,7 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_fuel_price_boxplot(self):
         """Graphique : Comparaison des prix par type de carburant (Boxplots)."""
         print("Création du graphique : Comparaison des prix par type de carburant (Boxplots)...")
@@ -147,6 +239,7 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_top_departments_highest_price(self, fuel_type):
         """Graphique : Top départements par prix le plus élevé pour un carburant spécifique."""
         print(f"Création du graphique : Top départements par prix le plus élevé pour le carburant {fuel_type}...")
@@ -168,6 +261,7 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_fossil_vs_alternative_fuel_prices(self):
         """Graphique : Comparaison des prix médians entre carburants fossiles et alternatifs."""
         print("Création du graphique : Comparaison des prix médians entre carburants fossiles et alternatifs...")
@@ -187,19 +281,20 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_service_distribution(self):
         """Graphique : Répartition des services disponibles."""
         print("Création du graphique : Répartition des services disponibles...")
 
-        if "services_service" not in self.df.columns:
-            raise Exception("La colonne 'services_service' est absente du DataFrame.")
-        
-        services_counts = (
-            self.df["services_service"]
-            .dropna()
-            .explode()
-            .value_counts()
-        )
+        if "services_mask" not in self.df.columns:
+            raise Exception("La colonne 'services_mask' est absente du DataFrame.")
+        if self.services_vocab is None:
+            raise Exception("Le vocabulaire des services doit être fourni pour décoder 'services_mask'.")
+
+        vocab = self.services_vocab
+        masks = self.df["services_mask"].to_numpy(dtype=np.uint64)
+        bits = (masks[:, None] >> np.arange(len(vocab), dtype=np.uint64)) & np.uint64(1)
+        services_counts = pd.Series(bits.sum(axis=0), index=vocab).sort_values(ascending=False)
 
         plt.figure(figsize=(10, 8))
         services_counts.plot(kind="bar", color="skyblue", edgecolor="black")
@@ -213,6 +308,7 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_automate_24_24_distribution(self):
         """Graphique : Disponibilité des automates 24/24."""
         print("Création du graphique : Disponibilité des automates 24/24...")
@@ -238,6 +334,7 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_average_fuel_outage_duration(self):
         """Graphique : Durée moyenne des ruptures temporaires de carburants."""
         print("Création du graphique : Durée moyenne des ruptures temporaires de carburants...")
@@ -253,13 +350,12 @@ class Visualizer:
                 print(f"Colonnes manquantes pour le carburant {fuel}: {start_col} ou {type_col}. Ignoré.")
                 continue
 
-            self.df[start_col] = pd.to_datetime(self.df[start_col], errors="coerce")
-            self.df[start_col] = self.df[start_col].dt.tz_localize(None)
+            start_dates = self._rupture_dates(start_col)
 
             temp_outages = self.df[self.df[type_col] == "temporaire"].copy()
 
             temp_outages.loc[:, f"{fuel}_rupture_duree"] = (
-                datetime.now() - temp_outages[start_col]
+                datetime.now() - start_dates[temp_outages.index]
             ).dt.days
 
             active_durations = temp_outages[f"{fuel}_rupture_duree"].dropna()
@@ -291,6 +387,7 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_fuel_availability_by_day(self):
         """Graphique : Disponibilité des carburants par jour de la semaine."""
         print("Création du graphique : Disponibilité des carburants par jour de la semaine...")
@@ -302,7 +399,7 @@ class Visualizer:
         days_of_week = []
         for col in rupture_cols:
             days_of_week.extend(
-                pd.to_datetime(self.df[col], errors="coerce").dropna().dt.day_name()
+                self._rupture_dates(col).dropna().dt.day_name()
             )
 
         day_counts = pd.Series(days_of_week).value_counts().reindex(
@@ -320,6 +417,7 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_station_distribution_by_population_density(self):
         """Graphique : Répartition des stations par densité de population."""
         print("Création du graphique : Répartition des stations par densité de population...")
@@ -345,17 +443,18 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_services_per_station(self):
         """Graphique : Nombre de services disponibles par station."""
         print("Création du graphique : Nombre de services disponibles par station...")
 
-        if "services" not in self.df.columns:
-            raise Exception("La colonne 'services' est absente du DataFrame.")
+        if "services_mask" not in self.df.columns:
+            raise Exception("La colonne 'services_mask' est absente du DataFrame.")
 
-        self.df["num_services"] = self.df["services"].apply(lambda x: len(x.split(", ")) if pd.notna(x) else 0)
+        num_services = pd.Series(np.bitwise_count(self.df["services_mask"].to_numpy(dtype=np.uint64)))
 
         bins = [0, 1, 5, 10, 15, 20, 25, 30]
-        self.df["num_services"].plot(
+        num_services.plot(
             kind="hist", bins=bins, figsize=(10, 6), color="purple", edgecolor="black"
         )
         plt.title("Nombre de services disponibles par station")
@@ -367,6 +466,7 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_station_distance_distribution(self):
         """Graphique : Distribution des distances entre stations en kilomètres."""
         print("Création du graphique : Distribution des distances entre stations...")
@@ -393,6 +493,7 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_median_prices_by_city_92(self):
         """Graphique : Prix médian des carburants par ville dans le département 92 (Hauts-de-Seine)."""
         print("Création du graphique : Prix médian des carburants par ville (Département 92)...")
@@ -418,14 +519,15 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_cheapest_vs_expensive_station(self):
         """Graphique : Comparaison des stations les moins chères et les plus chères."""
         print("Création du graphique : Comparaison des stations les moins chères et les plus chères...")
 
         fuel_cols = ["Gazole", "E10", "SP98", "SP95", "GPLc", "E85"]
-        self.df["prix_median"] = self.df[fuel_cols].apply(pd.to_numeric, errors='coerce').median(axis=1, skipna=True)
-
-        valid_stations = self.df.dropna(subset=["prix_median"])
+        valid_stations = self.df.assign(
+            prix_median=self.df[fuel_cols].apply(pd.to_numeric, errors='coerce').median(axis=1, skipna=True)
+        ).dropna(subset=["prix_median"])
 
         cheapest_station = valid_stations.loc[valid_stations["prix_median"].idxmin()]
         most_expensive_station = valid_stations.loc[valid_stations["prix_median"].idxmax()]
@@ -445,6 +547,7 @@ class Visualizer:
         plt.close()
         return self
     
+    @cached_graph
     def graph_avg_prices_highway_vs_others(self):
         """Graphique : Comparaison des prix médians entre stations sur autoroutes et autres."""
         print("Création du graphique : Prix médians (Autoroutes vs Autres)...")
@@ -467,6 +570,7 @@ class Visualizer:
         plt.close()
         return self
 
+    @cached_graph
     def graph_avg_price_full_tank_sp98(self):
         """Graphique : Prix moyen d'un plein de 50L de SP98 par région."""
         print("Création du graphique : Prix moyen d'un plein de 50L de SP98 par région...")
@@ -490,9 +594,24 @@ class Visualizer:
 
     def export(self, filename="visualizations.pdf"):
         """Exporte tous les graphiques dans un fichier PDF."""
-        self.pdf.output(filename)
+        try:
+            self.pdf.output(filename)
+        finally:
+            self.close()
         print(f"Rapport exporté dans le fichier : {filename}")
 
+    def close(self):
+        """Supprime le répertoire temporaire des images."""
+        if self._image_dir is not None:
+            self._image_dir.cleanup()
+            self._image_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 if __name__ == '__main__':
     df = pd.read_json("TP3/data/clear_dataset.json")
     visualizer = Visualizer(df)